@@ -1,13 +1,26 @@
 from abc import ABC, abstractmethod
+import asyncio
+import itertools
+import logging
 import os
-import json
-import time
+import pathlib
+import random
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import aiohttp
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import genanki
 import markdown2
 import argparse
 from dotenv import load_dotenv
 from tqdm import tqdm
+from tqdm.asyncio import tqdm_asyncio
+
+logger = logging.getLogger(__name__)
 
 
 class DefinitionFetcher(ABC):
@@ -16,6 +29,14 @@ class DefinitionFetcher(ABC):
         """Fetches the definition for a given term. The flag indicates if the term was found in the cache."""
         pass
 
+    def fetch_many(self, terms: list[str]) -> list[tuple[str, bool]]:
+        """Fetches definitions for several terms at once, in input order.
+
+        Defaults to one fetch call per term; implementations may override this
+        to batch the terms into a single request.
+        """
+        return [self.fetch(term) for term in terms]
+
     @abstractmethod
     def close(self):
         """Closes any resources used by the fetcher."""
@@ -53,126 +74,364 @@ class DeepInfraFetcher(DefinitionFetcher):
         self.api_key = api_key
         self.model = model
         self.cache_file = cache_file
-        self.cache = self._load_cache()
+        self._log_file = cache_file + ".log"
         self._dirty = False  # Track whether cache has been updated
-        self._last_save_timestamp = time.time()
-        self._save_interval = 15  # Save cache every 15 seconds
+        self._lock = threading.Lock()  # Guards cache mutation under threaded fetches
+        self.cache = self._load_cache()
+        # Append-only log for new entries; the base file is only rewritten on close()
+        self._log_fp = open(self._log_file, "a", encoding="utf-8", buffering=1)
+        # One keep-alive TLS connection reused across all fetches
+        self._session = requests.Session()
+        self._session.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=32,
+                max_retries=Retry(
+                    total=5,
+                    backoff_factor=1.0,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    respect_retry_after_header=True,
+                    # POST is not in urllib3's default retryable set
+                    allowed_methods=frozenset(["POST"]),
+                ),
+            ),
+        )
+        self._session.headers.update(
+            {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            }
+        )
+        # Immutable request pieces, built once instead of per fetch
+        self._url = "https://api.deepinfra.com/v1/openai/chat/completions"
+        system_prompt = (
+            "You are an expert in startups and business education. Provide concise definitions in Russian for key startup terminology, "
+            "suitable for direct inclusion in educational flashcards. Each definition should be 1–2 sentences and clear to a university-level student. "
+            "No extra explanations, no headings, no intro or outro. You can add an example case (or a usage example) in a "
+            "new paragraph if it helps to understand the term. The term itself should be wrapped in <b>...</b>. "
+            "Use <p> for paragraphs. Return plain HTML, no Markdown."
+        )
+        self._system_msg = {"role": "system", "content": system_prompt}
+        self._batch_system_msg = {
+            "role": "system",
+            "content": system_prompt
+            + ' Answer with a JSON object {"definitions": [{"term": ..., "definition": ...}, ...]} covering every requested term.',
+        }
+        self._user_tmpl = "Дай краткое определение термина «%s» в контексте стартапов и бизнеса на русском языке."
+        self._batch_user_tmpl = (
+            "Верни JSON-массив объектов {term, definition} для следующих терминов "
+            "в контексте стартапов и бизнеса на русском языке: %s"
+        )
+
+    @staticmethod
+    def _canon(term: str) -> str:
+        """Canonical cache key: Unicode-normalized, trimmed and case-insensitive,
+        so near-duplicate spellings ("MVP", "mvp", " MVP ") share one entry."""
+        return unicodedata.normalize("NFKC", term).strip().casefold()
+
+    @staticmethod
+    def _ensure_html(definition: str) -> str:
+        """One-time migration for legacy Markdown definitions; new entries arrive
+        as HTML straight from the model."""
+        if "<" in definition:
+            return definition
+        return markdown2.markdown(definition)
 
     def _load_cache(self) -> dict:
-        if os.path.exists(self.cache_file):
-            with open(self.cache_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return {}
+        base = pathlib.Path(self.cache_file)
+        raw = orjson.loads(base.read_bytes()) if base.exists() else {}
+        cache = {}
+        for key, entry in raw.items():
+            if isinstance(entry, str):
+                # Legacy flat-string entry (Markdown only)
+                entry = {"display": key, "html": self._ensure_html(entry)}
+                self._dirty = True
+            elif "md" in entry or "display" not in entry:
+                # Entry predates canonical keys and/or HTML-only payloads
+                entry = {
+                    "display": entry.get("display", key),
+                    "html": entry.get("html") or self._ensure_html(entry["md"]),
+                }
+                self._dirty = True
+            cache[self._canon(key)] = entry
+        log = pathlib.Path(self._log_file)
+        if log.exists():
+            # Replay entries appended since the last compaction (e.g. after a crash)
+            for line in log.read_bytes().splitlines():
+                if line.strip():
+                    entry = orjson.loads(line)
+                    cache[self._canon(entry["t"])] = {
+                        "display": entry["t"],
+                        "html": self._ensure_html(entry["d"]),
+                    }
+                    self._dirty = True
+        return cache
+
+    def _cached_html(self, key: str) -> str:
+        return self.cache[key]["html"]
+
+    def _append_log(self, term: str, definition: str):
+        self._log_fp.write(
+            orjson.dumps({"t": term, "d": definition}).decode() + "\n"
+        )
 
     def _save_cache(self):
-        if self._dirty:
-            with open(self.cache_file, "w", encoding="utf-8") as f:
-                json.dump(self.cache, f, ensure_ascii=False, indent=2)
+        if not self._dirty:
+            return
+        # Write to a sibling temp file and swap atomically, so a kill mid-write
+        # cannot truncate the cache
+        tmp = self.cache_file + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(self.cache))
+        os.replace(tmp, self.cache_file)
+        self._dirty = False
 
     def fetch(self, term: str) -> tuple[str, bool]:
-        if term in self.cache:
-            html_def = markdown2.markdown(self.cache[term])
-            return html_def, True
+        key = self._canon(term)
+        if key in self.cache:
+            # Cache hit: the HTML was rendered when the entry was stored
+            logger.debug("cache hit: %s", term)
+            return self._cached_html(key), True
+        logger.debug("cache miss: %s", term)
 
-        system_prompt = (
-            "You are an expert in startups and business education. Provide concise definitions in Russian for key startup terminology, "
-            "suitable for direct inclusion in educational flashcards. Each definition should be 1–2 sentences and clear to a university-level student. "
-            "No extra explanations, no headings, no intro or outro. You can add an example case (or a usage example) in a "
-            "new paragraph if it helps to understand the term. The term itself should be formatted in bold."
-        )
-
-        user_prompt = f"Дай краткое определение термина «{term}» в контексте стартапов и бизнеса на русском языке."
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
         json_data = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
+                self._system_msg,
+                {"role": "user", "content": self._user_tmpl % term},
             ],
         }
 
-        response = requests.post(
-            "https://api.deepinfra.com/v1/openai/chat/completions",
-            headers=headers,
-            json=json_data,
-        )
+        response = self._session.post(self._url, json=json_data, timeout=(5, 60))
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content)
             definition = result["choices"][0]["message"]["content"].strip()
-            self.cache[term] = definition
-            self._dirty = True
-            html_def = markdown2.markdown(definition)
-            if time.time() - self._last_save_timestamp > self._save_interval:
-                self._save_cache()
-                self._last_save_timestamp = time.time()
-            return html_def, False
+            with self._lock:
+                self.cache[key] = {"display": term, "html": definition}
+                self._dirty = True
+                self._append_log(term, definition)
+            return definition, False
         else:
             raise Exception(f"Error fetching definition for {term}: {response.text}")
 
+    def fetch_many(self, terms: list[str]) -> list[tuple[str, bool]]:
+        """Fetches definitions for several terms in one chat-completions call.
+
+        Cached terms are served from the cache; all uncached terms in the batch
+        share a single HTTP request, which amortizes request overhead and RPM
+        quota across the batch.
+        """
+        uncached = [term for term in terms if self._canon(term) not in self.cache]
+        logger.debug("batch of %d terms, %d uncached", len(terms), len(uncached))
+        if uncached:
+            json_data = {
+                "model": self.model,
+                "messages": [
+                    self._batch_system_msg,
+                    {
+                        "role": "user",
+                        "content": self._batch_user_tmpl
+                        % orjson.dumps(uncached).decode(),
+                    },
+                ],
+                "response_format": {"type": "json_object"},
+            }
+
+            response = self._session.post(self._url, json=json_data, timeout=(5, 60))
+            if response.status_code != 200:
+                raise Exception(
+                    f"Error fetching definitions for {uncached}: {response.text}"
+                )
+            result = orjson.loads(response.content)
+            content = orjson.loads(result["choices"][0]["message"]["content"])
+            if isinstance(content, dict):
+                # Unwrap {"definitions": [...]} (or any single-key wrapper)
+                content = next(iter(content.values()))
+            by_term = {item["term"]: item["definition"] for item in content}
+            for term, item in zip(uncached, content):
+                # Zip back by position for terms the model renamed
+                definition = by_term.get(term, item["definition"]).strip()
+                with self._lock:
+                    self.cache[self._canon(term)] = {
+                        "display": term,
+                        "html": definition,
+                    }
+                    self._dirty = True
+                    self._append_log(term, definition)
+
+        uncached_keys = {self._canon(term) for term in uncached}
+        return [
+            (self._cached_html(key), key not in uncached_keys)
+            for key in map(self._canon, terms)
+        ]
+
     def close(self):
+        self._session.close()
+        self._log_fp.close()
         self._save_cache()
+        # Compaction happened; the log is now redundant
+        if os.path.exists(self._log_file):
+            os.remove(self._log_file)
+
+
+class AsyncDeepInfraFetcher(DeepInfraFetcher):
+    """Async variant of DeepInfraFetcher that overlaps HTTP requests.
+
+    Shares a single aiohttp session (keep-alive + connection pool) across all
+    fetches. Use it as an async context manager together with
+    generate_output_async.
+    """
+
+    async def __aenter__(self):
+        """Enters the async context manager, opening the shared HTTP session."""
+        self._aio_session = aiohttp.ClientSession()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Exits the async context manager, closing the session and saving the cache."""
+        await self._aio_session.close()
+        self.close()
+        return False  # Do not suppress exceptions
+
+    _MAX_RETRIES = 5
+    _RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    async def _post_with_retry(self, json_data: dict, what: str) -> bytes:
+        """POSTs with exponential backoff on transient errors, honoring the
+        Retry-After header when the server sends one."""
+        for attempt in range(self._MAX_RETRIES + 1):
+            async with self._aio_session.post(
+                self._url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json=json_data,
+            ) as response:
+                if response.status == 200:
+                    return await response.read()
+                text = await response.text()
+                if (
+                    response.status not in self._RETRY_STATUSES
+                    or attempt == self._MAX_RETRIES
+                ):
+                    raise Exception(f"Error fetching {what}: {text}")
+                retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+            else:
+                delay = 2**attempt
+            # Jitter spreads out retries from concurrent tasks
+            await asyncio.sleep(delay + random.uniform(0, 0.5))
+
+    async def fetch(self, term: str) -> tuple[str, bool]:  # type: ignore[override]
+        key = self._canon(term)
+        if key in self.cache:
+            logger.debug("cache hit: %s", term)
+            return self._cached_html(key), True
+        logger.debug("cache miss: %s", term)
+
+        json_data = {
+            "model": self.model,
+            "messages": [
+                self._system_msg,
+                {"role": "user", "content": self._user_tmpl % term},
+            ],
+        }
+
+        body = await self._post_with_retry(json_data, f"definition for {term}")
+        result = orjson.loads(body)
+        definition = result["choices"][0]["message"]["content"].strip()
+        # Single-threaded event loop, so no lock is needed around the cache
+        self.cache[key] = {"display": term, "html": definition}
+        self._dirty = True
+        self._append_log(term, definition)
+        return definition, False
 
 
 class OutputStrategy(ABC):
     @abstractmethod
-    def output(self, terms_with_defs: list, output_path: str):
+    def output(self, terms_with_defs, output_path: str):
         """
         Saves the terms and definitions to the specified output path using the implemented strategy.
-        :param terms_with_defs: List of tuples containing terms and their definitions.
+        :param terms_with_defs: Iterable of tuples containing terms and their definitions.
         :param output_path: Path to the output file.
         """
         pass
 
 
 class TermNote(genanki.Note):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # genanki reads guid repeatedly during deck assembly; hash the term once
+        self._cached_guid = genanki.guid_for(self.fields[0])  # type: ignore
+
     @property
     def guid(self):
-        return genanki.guid_for(self.fields[0])  # type: ignore
+        return self._cached_guid
+
+
+_DECK_ID = 1311755446
+_MODEL_ID = 1496530154
+
+# Ids and templates are constants, so the model is built once per process
+_STARTUP_MODEL = genanki.Model(
+    _MODEL_ID,
+    "Startup Terms Model",
+    fields=[
+        {"name": "Term"},
+        {"name": "Definition"},
+    ],
+    templates=[
+        {
+            "name": "Card 1",
+            "qfmt": "{{Term}}",
+            "afmt": '{{FrontSide}}<hr id="answer">{{Definition}}',
+        },
+    ],
+)
 
 
 class AnkiOutputStrategy(OutputStrategy):
-    def output(self, terms_with_defs: list, output_path: str):
-        deck_id = 1311755446
-        model_id = 1496530154
-
-        my_model = genanki.Model(
-            model_id,
-            "Startup Terms Model",
-            fields=[
-                {"name": "Term"},
-                {"name": "Definition"},
-            ],
-            templates=[
-                {
-                    "name": "Card 1",
-                    "qfmt": "{{Term}}",
-                    "afmt": '{{FrontSide}}<hr id="answer">{{Definition}}',
-                },
-            ],
-        )
-
-        my_deck = genanki.Deck(deck_id, "Startup Terms in Russian")
+    def output(self, terms_with_defs, output_path: str):
+        my_deck = genanki.Deck(_DECK_ID, "Startup Terms in Russian")
 
-        for term, definition in terms_with_defs:
-            note = TermNote(model=my_model, fields=[term, definition])
-            my_deck.add_note(note)
+        items = (
+            terms_with_defs
+            if isinstance(terms_with_defs, list)
+            else list(terms_with_defs)
+        )
+        # Pre-size the notes list and assign by index instead of growing via add_note
+        notes = [None] * len(items)
+        for index, (term, definition) in enumerate(items):
+            notes[index] = TermNote(model=_STARTUP_MODEL, fields=[term, definition])
+        my_deck.notes = notes
 
         genanki.Package(my_deck).write_to_file(output_path)
 
 
 class DebugOutputStrategy(OutputStrategy):
-    def output(self, terms_with_defs: list, output_path: str):
-        with open(output_path, "w", encoding="utf-8") as f:
-            for term, definition in terms_with_defs:
-                f.write(f"Term: {term}\nDefinition: {definition}\n\n")
+    def output(self, terms_with_defs, output_path: str):
+        # One join + one write instead of a write call per term
+        with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+            f.write(
+                "".join(
+                    f"Term: {term}\nDefinition: {definition}\n\n"
+                    for term, definition in terms_with_defs
+                )
+            )
 
 
 def load_terms(file_path: str) -> list:
-    with open(file_path, "r", encoding="utf-8") as f:
-        return [line.strip() for line in f if line.strip()]
+    # One buffer read + C-level splitlines instead of Python file iteration
+    with open(file_path, "rb") as f:
+        data = f.read()
+    return [s for line in data.splitlines() if (s := line.decode("utf-8").strip())]
+
+
+def chunked(items: list, size: int):
+    """Yields successive chunks of at most `size` items."""
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
 
 
 def generate_output(
@@ -180,17 +439,68 @@ def generate_output(
     fetcher: DefinitionFetcher,
     output_strategy: OutputStrategy,
     output_path: str,
+    batch_size: int = 10,
 ):
-    terms_with_defs = []
-    with tqdm(total=len(terms), desc="Fetching terms", ncols=100) as pbar:
-        for term in terms:
-            pbar.set_description(f"Fetching: {term}")
-            definition, from_cache = fetcher.fetch(term)
-            status = "cache" if from_cache else "API"
-            pbar.set_description(f"Fetched: {term} ({status})")
-            terms_with_defs.append((term, definition))
-            pbar.update(1)
-    output_strategy.output(terms_with_defs, output_path)
+    # Fetch each distinct term once, in input order; duplicates reuse the result
+    unique_terms = list(dict.fromkeys(terms))
+    defs = {}
+    with tqdm(total=len(unique_terms), desc="Terms", ncols=100) as pbar:
+        for chunk in chunked(unique_terms, batch_size):
+            results = fetcher.fetch_many(chunk)
+            for term, (definition, from_cache) in zip(chunk, results):
+                # refresh=False: let tqdm's mininterval coalesce redraws
+                pbar.set_postfix_str("cache" if from_cache else "API", refresh=False)
+                defs[term] = definition
+                pbar.update(1)
+    # Lazily expand back to input order; strategies materialize only if they must
+    output_strategy.output(((term, defs[term]) for term in terms), output_path)
+
+
+def generate_output_threaded(
+    terms: list,
+    fetcher: DefinitionFetcher,
+    output_strategy: OutputStrategy,
+    output_path: str,
+    max_workers: int = 16,
+):
+    """Drop-in concurrent variant of generate_output: the synchronous fetch
+    calls run in a thread pool and overlap on socket I/O."""
+    unique_terms = list(dict.fromkeys(terms))
+    defs = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetcher.fetch, term): term for term in unique_terms
+        }
+        with tqdm(total=len(futures), desc="Terms", ncols=100) as pbar:
+            for future in as_completed(futures):
+                term = futures[future]
+                definition, from_cache = future.result()
+                pbar.set_postfix_str("cache" if from_cache else "API", refresh=False)
+                defs[term] = definition
+                pbar.update(1)
+    output_strategy.output(((term, defs[term]) for term in terms), output_path)
+
+
+async def generate_output_async(
+    terms: list,
+    fetcher: AsyncDeepInfraFetcher,
+    output_strategy: OutputStrategy,
+    output_path: str,
+    concurrency: int = 16,
+):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _bounded(term: str):
+        async with semaphore:
+            definition, from_cache = await fetcher.fetch(term)
+        return term, definition, from_cache
+
+    # One task per distinct term; duplicate terms share the single in-flight fetch
+    unique_terms = list(dict.fromkeys(terms))
+    tasks = [asyncio.create_task(_bounded(term)) for term in unique_terms]
+    results = await tqdm_asyncio.gather(*tasks, desc="Terms", ncols=100)
+    defs = {term: definition for term, definition, _ in results}
+    output_strategy.output(((term, defs[term]) for term in terms), output_path)
 
 
 def main():
@@ -222,13 +532,15 @@ def main():
         "-f",
         "--fetcher",
         type=str,
-        choices=["dummy", "deepinfra"],
+        choices=["dummy", "deepinfra", "deepinfra-async", "deepinfra-threaded"],
         default="deepinfra",
-        help="Fetcher to use: 'dummy' for testing, 'deepinfra' for real API calls (requires environment variable DEEPINFRA_API_KEY). Default is 'deepinfra'.",
+        help="Fetcher to use: 'dummy' for testing, 'deepinfra' for real API calls (requires environment variable DEEPINFRA_API_KEY), 'deepinfra-async' or 'deepinfra-threaded' for concurrent API calls. Default is 'deepinfra'.",
     )
     
     args = parser.parse_args()
 
+    logging.basicConfig(level=os.environ.get("LOGLEVEL", "WARNING"))
+
     load_dotenv()
 
     def get_api_key():
@@ -261,13 +573,25 @@ def main():
         print(f"Input file {args.input_path} does not exist.")
         exit(1)
 
-    with get_fetcher() as fetcher:
-        terms = load_terms(args.input_path)
-        strategy = get_output_strategy()
-        generate_output(terms, fetcher, strategy, args.output_path)
-        print(
-            f"Processed {len(terms)} terms using {strategy.__class__.__name__} and saved to {args.output_path}."
-        )
+    terms = load_terms(args.input_path)
+    strategy = get_output_strategy()
+
+    if args.fetcher == "deepinfra-async":
+
+        async def run_async():
+            async with AsyncDeepInfraFetcher(api_key=get_api_key()) as fetcher:
+                await generate_output_async(terms, fetcher, strategy, args.output_path)
+
+        asyncio.run(run_async())
+    elif args.fetcher == "deepinfra-threaded":
+        with DeepInfraFetcher(api_key=get_api_key()) as fetcher:
+            generate_output_threaded(terms, fetcher, strategy, args.output_path)
+    else:
+        with get_fetcher() as fetcher:
+            generate_output(terms, fetcher, strategy, args.output_path)
+    print(
+        f"Processed {len(terms)} terms using {strategy.__class__.__name__} and saved to {args.output_path}."
+    )
 
 
 if __name__ == "__main__":